@@ -1,8 +1,15 @@
+import atexit
+import bisect
 import threading
 import time
-import math
 import logging
+import logging.handlers
+import queue
 import json
+import os
+import random
+import sys
+from collections import Counter
 from types import SimpleNamespace
 from pathlib import Path
 
@@ -10,23 +17,49 @@ from datetime import datetime, timedelta, time as dt_time
 from zoneinfo import ZoneInfo
 
 from ib_insync import IB, MarketOrder, LimitOrder, Contract, Option, Future
+from ib_insync.util import UNSET_DOUBLE
 from threading import Lock
 
+try:
+    import orjson  # optional: faster JSON encode/decode
+except ImportError:
+    orjson = None
+
+# --- Bot log: records go on a queue and a listener thread does the blocking stdout write ---
+log = logging.getLogger('covered_call')
+log.setLevel(logging.INFO)
+log.propagate = False  # keep clear of the silenced root logger
+_log_queue = queue.SimpleQueue()
+log.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_stream = logging.StreamHandler(sys.stdout)
+_log_stream.setFormatter(logging.Formatter('%(message)s'))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+_log_listener.start()
+# Registered first so it runs last at exit, after other hooks have logged
+atexit.register(_log_listener.stop)
+
 
 # --- Generic JSON loader ---
 def safe_json_load(path: Path, default):
     """
-    Safely load JSON from a file, returning default if any error occurs.
+    Safely load JSON from a file, returning default if it is missing or unreadable.
     """
+    # Common cold-start case: no file yet, skip the exception path entirely
+    if not path.exists():
+        return default
     try:
-        return json.loads(path.read_text())
+        raw = path.read_bytes()
+        return orjson.loads(raw) if orjson else json.loads(raw)
     except Exception:
         return default
 
 
 # File to persist baseline MES price across restarts
 BASE_PRICE_FILE = Path(__file__).with_suffix('.base_mes_price.json')
-# File to track daily and weekly roll counts
+# Append-only roll log: one YYYY-MM-DD line per completed roll
+ROLL_LOG_FILE = Path(__file__).with_suffix('.rolls.log')
+ROLL_LOG_KEEP_DAYS = 14  # history kept when the log is compacted at startup
+# Legacy nested-dict roll counts, only read to seed a missing roll log
 ROLL_COUNTS_FILE = Path(__file__).with_suffix('.roll_counts.json')
 
 def load_base_mes_price():
@@ -39,25 +72,160 @@ def load_base_mes_price():
     except Exception:
         return None
 
+def _write_json_atomic(path: Path, data):
+    """
+    Write compact JSON to a temp file and rename it over path so readers never see a partial file.
+    """
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    payload = orjson.dumps(data) if orjson else json.dumps(data, separators=(',', ':')).encode()
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+
+# ─── Debounced persistence: mutators mark state dirty, the flusher writes it ───
+PERSIST_COALESCE_DELAY = 0.2  # seconds to let a burst of updates land before writing
+_persist_lock = Lock()
+_dirty_event = threading.Event()  # set when there is state waiting to be written
+_pending_base_price = None  # baseline awaiting flush, or None
+_pending_roll_dates = []    # roll dates awaiting append to the roll log
+
 def save_base_mes_price(price):
-    try:
-        BASE_PRICE_FILE.write_text(json.dumps(price))
-        print(f"📦 Saved baseline MES price: {price:.2f}")
-    except Exception as e:
-        print(f"⚠️ Failed to save base MES price: {e}")
+    """
+    Queue the baseline MES price for the next background flush.
+    """
+    global _pending_base_price
+    with _persist_lock:
+        _pending_base_price = price
+    _dirty_event.set()
 
 # --- Roll counts persistence ---
+def _roll_day(text):
+    """The datetime for a YYYY-MM-DD roll-log entry, or None if it is malformed."""
+    try:
+        return datetime.strptime(text, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
 def load_roll_counts():
     """
-    Load persisted roll counts, or initialize empty daily/weekly structure.
+    Count the roll log into (daily, weekly) Counters; seeds the log from the legacy
+    JSON counts if it does not exist yet. Malformed lines (e.g. a partial append left
+    by a crash) are skipped, and the log is compacted to the last ROLL_LOG_KEEP_DAYS.
     """
-    return safe_json_load(ROLL_COUNTS_FILE, {'daily': {}, 'weekly': {}})
+    daily, rewrite = Counter(), not ROLL_LOG_FILE.exists()
+    if rewrite:
+        legacy = safe_json_load(ROLL_COUNTS_FILE, {})
+        legacy = legacy.get('daily') if isinstance(legacy, dict) else None
+        if isinstance(legacy, dict):
+            for day, n in legacy.items():
+                if _roll_day(day) and isinstance(n, int) and n > 0:
+                    daily[day] = n
+    else:
+        with open(ROLL_LOG_FILE) as f:
+            for line in f:
+                day = line.strip()
+                if not day:
+                    continue
+                if _roll_day(day) is None:
+                    log.warning("⚠️ Skipping malformed roll-log line: %r", day)
+                    rewrite = True
+                    continue
+                daily[day] += 1
+    cutoff = (datetime.now(NY).date() - timedelta(days=ROLL_LOG_KEEP_DAYS)).strftime('%Y-%m-%d')
+    kept = Counter({day: n for day, n in daily.items() if day >= cutoff})
+    if rewrite or kept != daily:
+        # Compact (or create) the log; entries are few, so rewrite it atomically
+        try:
+            tmp = ROLL_LOG_FILE.with_suffix(ROLL_LOG_FILE.suffix + '.tmp')
+            tmp.write_text(''.join(f"{day}\n" * n for day, n in sorted(kept.items())))
+            os.replace(tmp, ROLL_LOG_FILE)
+        except Exception as e:
+            log.warning("⚠️ Failed to compact roll log: %s", e)
+    weekly = Counter()
+    for day, n in kept.items():
+        iso = _roll_day(day).isocalendar()
+        weekly[f"{iso[0]}-W{iso[1]:02d}"] += n
+    return kept, weekly
 
-def save_roll_counts(counts):
-    try:
-        ROLL_COUNTS_FILE.write_text(json.dumps(counts))
-    except Exception as e:
-        print(f"⚠️ Failed to save roll counts: {e}")
+# In-memory roll counts are the source of truth; filled by init_roll_counts() at bot startup
+_daily_rolls, _weekly_rolls = Counter(), Counter()
+
+def init_roll_counts():
+    """
+    Flush any queued rolls, then (re)load the roll log into the in-memory counters.
+    """
+    global _daily_rolls, _weekly_rolls
+    flush_persisted_state()
+    daily, weekly = load_roll_counts()
+    with _persist_lock:
+        _daily_rolls, _weekly_rolls = daily, weekly
+
+def increment_roll_counts(today, week_key):
+    """
+    Count one roll for today and week_key; returns the updated (daily, weekly) totals.
+    """
+    with _persist_lock:
+        _daily_rolls[today] += 1
+        _weekly_rolls[week_key] += 1
+        daily, weekly = _daily_rolls[today], _weekly_rolls[week_key]
+        _pending_roll_dates.append(today)
+    _dirty_event.set()
+    return daily, weekly
+
+_today_str, _week_key, _keys_valid_until = '', '', 0.0
+
+def roll_count_keys():
+    """
+    Return the (daily, weekly) roll-count keys for NY time, cached until the next midnight.
+    """
+    global _today_str, _week_key, _keys_valid_until
+    if time.time() >= _keys_valid_until:
+        now = datetime.now(NY)
+        _today_str = now.strftime('%Y-%m-%d')
+        iso = now.isocalendar()
+        _week_key = f"{iso[0]}-W{iso[1]:02d}"
+        tomorrow_midnight = datetime.combine(now.date() + timedelta(days=1), dt_time(0, 0), NY)
+        _keys_valid_until = tomorrow_midnight.timestamp()
+    return _today_str, _week_key
+
+def flush_persisted_state():
+    """
+    Write any pending baseline price and append pending rolls to the roll log.
+    """
+    global _pending_base_price
+    with _persist_lock:
+        price, _pending_base_price = _pending_base_price, None
+        rolls = _pending_roll_dates[:]
+        del _pending_roll_dates[:]
+    if price is not None:
+        try:
+            _write_json_atomic(BASE_PRICE_FILE, price)
+            log.info("📦 Saved baseline MES price: %.2f", price)
+        except Exception as e:
+            log.warning("⚠️ Failed to save base MES price: %s", e)
+            with _persist_lock:
+                if _pending_base_price is None:
+                    _pending_base_price = price
+    if rolls:
+        try:
+            with open(ROLL_LOG_FILE, 'a') as f:
+                f.write(''.join(f"{day}\n" for day in rolls))
+        except Exception as e:
+            log.warning("⚠️ Failed to save roll counts: %s", e)
+            with _persist_lock:
+                _pending_roll_dates[:0] = rolls
+
+def persist_flusher():
+    """
+    Wait for state to be marked dirty, then write it off the trading thread;
+    a short delay coalesces back-to-back updates (e.g. baseline + roll count) into one flush.
+    """
+    while True:
+        _dirty_event.wait()
+        time.sleep(PERSIST_COALESCE_DELAY)
+        _dirty_event.clear()
+        flush_persisted_state()
+
+atexit.register(flush_persisted_state)
 # Silence all ib_insync logging and IB errorEvent callbacks
 logging.getLogger().setLevel(logging.CRITICAL)
 logging.getLogger('ib_insync').setLevel(logging.CRITICAL)
@@ -80,11 +248,48 @@ MES_MOVE_DOWN_THRESHOLD = 15   # points MES must FALL before a roll‑DOWN
 
 CANCELLATION_DELAY = 5  # seconds to wait for an option fill before cancelling
 
+# ─── Restart supervision ───
+MAX_RESTART_DELAY     = 300  # cap (s) for the exponential restart backoff
+MAX_CONSECUTIVE_FAILS = 10   # exit non-zero after this many back-to-back crashes so the supervisor restarts us
+HEALTHY_RUN_SECONDS   = 600  # a run that lasted this long counts as recovered and resets the backoff
+
+# ─── Market hours (New York time) ───
+NY            = ZoneInfo('America/New_York')
+MKT_CLOSE     = dt_time(17, 0)   # daily close / weekend close on Friday
+MKT_OPEN      = dt_time(18, 0)   # reopen after maintenance / Sunday open
+FLATTEN_START = dt_time(16, 50)  # Friday auto-flatten window start
+
 # ─── Real‑time summary state ───
-summary_lock   = Lock()
+# summary_data is an immutable-by-convention snapshot: the trading loop publishes a
+# new dict via a single reference swap and the printer reads it without locking.
 summary_data   = {}   # will hold keys: price, strike, bid, ask, spread, fut_bid, fut_ask, cost, pnl, pnl_pct, down_left, up_left, pct_to_profit, pct_to_loss
-summary_paused = False  # True while an order is working
-skip_summary_count = 0  # cycles to skip after a fill
+_paused_event  = threading.Event()  # set while an order is working
+SUMMARY_SKIP_CYCLES = 2  # printer cycles to skip after a fill
+_summary_resume_at = 0.0  # monotonic time before which the printer stays quiet
+# Keys a snapshot must carry before the printer will show it
+_SUMMARY_REQUIRED_KEYS = frozenset({'mes_rt_price','price','strike','bid','ask','spread',
+                                    'fut_bid','fut_ask','cost','pnl','pnl_pct','cash',
+                                    'pct_to_profit','pct_to_loss','down_left','up_left'})
+
+def publish_summary(**fields):
+    """Publish a new summary snapshot merged with fields (single atomic rebind)."""
+    global summary_data
+    summary_data = {**summary_data, **fields}
+
+def set_summary(snapshot):
+    """Publish snapshot as the complete summary (caller must not mutate it afterwards)."""
+    global summary_data
+    summary_data = snapshot
+
+def skip_summary(cycles=SUMMARY_SKIP_CYCLES):
+    """Silence the printer for the next cycles (a single write; the printer only reads it)."""
+    global _summary_resume_at
+    _summary_resume_at = time.monotonic() + 2 * cycles
+
+def clear_summary():
+    """Publish an empty summary snapshot so stale data is not printed."""
+    global summary_data
+    summary_data = {}
 
 # ─── Summary print thresholds ───
 LAST_PRINTED_PNL = None    # last printed P/L percent
@@ -93,9 +298,10 @@ PNL_PRINT_THRESHOLD = 0.5  # percent change threshold to reprint summary
 SPREAD_PRINT_THRESHOLD = 0.25  # dollar change threshold for spread
 # ─────────────────────────────────
 
-def get_expiry_and_future_expiry():
-    ny = ZoneInfo('America/New_York')
-    now = datetime.now(ny)
+_expiry_cache = (None, None, 0.0)  # (expiry, fut_expiry, valid_until epoch)
+
+def _compute_expiry(now):
+    """Return (expiry 'YYYYMMDD', future month 'YYYYMM') for a NY datetime."""
     if now.hour < 16:
         exp_date = now.date()
     else:
@@ -108,70 +314,346 @@ def get_expiry_and_future_expiry():
     fut_expiry = exp_date.strftime('%Y%m')
     return expiry, fut_expiry
 
+def get_expiry_and_future_expiry():
+    """
+    Return (expiry, fut_expiry), recomputed only when the 16:00 ET cutoff or midnight passes.
+    """
+    global _expiry_cache
+    now_ts = time.time()
+    if now_ts < _expiry_cache[2]:
+        return _expiry_cache[0], _expiry_cache[1]
+    now = datetime.now(NY)
+    expiry, fut_expiry = _compute_expiry(now)
+    # The result depends only on the date and whether it is before 16:00
+    if now.hour < 16:
+        valid_until = datetime.combine(now.date(), dt_time(16, 0), NY)
+    else:
+        valid_until = datetime.combine(now.date() + timedelta(days=1), dt_time(0, 0), NY)
+    _expiry_cache = (expiry, fut_expiry, valid_until.timestamp())
+    return expiry, fut_expiry
+
+# ─── Market open/closed state (CME MES: Sunday 18:00 ET, weekdays 18:00->17:00 daily maintenance) ───
+_next_open_cache = None     # (valid_until, reopen_dt) while the market is closed
+_market_state_cache = None  # (valid_until, closed) until the next open/close boundary
+
+def _compute_next_open(now_dt):
+    """
+    Return the next datetime (NY time) when CME MES re-opens, or now_dt if open.
+    """
+    today = now_dt.date()
+    t = now_dt.time()
+    wkd = now_dt.weekday()
+    # Friday after 17:00 → Sunday 18:00
+    if (wkd == 4 and t >= MKT_CLOSE) or wkd == 5:
+        # Advance to Sunday
+        days_ahead = (6 - wkd) % 7  # days until Sunday
+        sunday = today + timedelta(days=days_ahead)
+        return datetime.combine(sunday, MKT_OPEN, NY)
+    # Sunday before 18:00
+    if wkd == 6 and t < MKT_OPEN:
+        return datetime.combine(today, MKT_OPEN, NY)
+    # Daily maintenance 17:00‑18:00
+    if MKT_CLOSE <= t < MKT_OPEN:
+        return datetime.combine(today, MKT_OPEN, NY)
+    # Otherwise we're open now
+    return now_dt
+
+def next_open_time(now_dt):
+    """
+    Return the next datetime (NY time) when CME MES re-opens.
+    The answer is fixed for a whole closed window, so it is reused until the reopen time.
+    """
+    global _next_open_cache
+    if _next_open_cache and now_dt < _next_open_cache[0]:
+        return _next_open_cache[1]
+    reopen_dt = _compute_next_open(now_dt)
+    if reopen_dt > now_dt:
+        _next_open_cache = (reopen_dt, reopen_dt)
+    return reopen_dt
+
+def market_closed(now_dt):
+    """
+    True if CME MES is in a closed window (weekend or daily maintenance) at now_dt.
+    """
+    global _market_state_cache
+    if _market_state_cache and now_dt < _market_state_cache[0]:
+        return _market_state_cache[1]
+    reopen_dt = next_open_time(now_dt)
+    closed = reopen_dt > now_dt
+    if closed:
+        valid_until = reopen_dt
+    else:
+        # Open: state holds until the next 17:00 ET close
+        close_date = now_dt.date() if now_dt.time() < MKT_CLOSE else now_dt.date() + timedelta(days=1)
+        valid_until = datetime.combine(close_date, MKT_CLOSE, NY)
+    _market_state_cache = (valid_until, closed)
+    return closed
+
 # ───────── HELPERS ─────────
 
+# ─── Contract cache: qualified contracts reused until the expiry rolls ───
+_contract_cache = {}  # ('FUT', symbol, fut_month) -> qualified Contract
+_option_chain_cache = {}  # expiry -> (sorted_strikes, {strike: Contract})
+
+def _evict_contract_cache(kind, keep_key):
+    """Drop cached entries of the given kind that do not match keep_key."""
+    for key in [k for k in _contract_cache if k[0] == kind and k != keep_key]:
+        del _contract_cache[key]
+
+def invalidate_contract_cache():
+    """Forget all cached contracts (e.g. after a contract-not-found error)."""
+    _contract_cache.clear()
+    _option_chain_cache.clear()
+    _qualified_ids.clear()
+
+_qualified_ids = set()  # conIds of option contracts already resolved against IB
+
+def mark_qualified(*contracts):
+    """Record contracts as qualified so later orders skip re-qualifying them."""
+    _qualified_ids.update(c.conId for c in contracts if getattr(c, 'conId', 0))
+
+def ensure_qualified(ib, contract):
+    """Qualify contract only if its conId has not been qualified before."""
+    if contract.conId not in _qualified_ids:
+        ib.qualifyContracts(contract)
+        mark_qualified(contract)
+
+def get_mes_future(ib, *also_qualify):
+    """
+    Return the qualified MES future, querying IB only on the first call
+    or after the front month has rolled. Any also_qualify contracts are
+    qualified in the same batched request.
+    """
+    _, fut_month = get_expiry_and_future_expiry()
+    key = ('FUT', UNDERLYING, fut_month)
+    fut_contract = _contract_cache.get(key)
+    if fut_contract is None:
+        _evict_contract_cache('FUT', key)
+        details = ib.reqContractDetails(Contract(
+            symbol=UNDERLYING, secType='FUT', exchange='CME', currency='USD'
+        ))
+        if not details:
+            raise Exception("No MES future contract found")
+        fut_contract = details[0].contract
+        _contract_cache[key] = fut_contract
+    # Skip re-qualifying the future once it carries a conId
+    pending = list(also_qualify)
+    if not getattr(fut_contract, 'conId', 0):
+        pending.append(fut_contract)
+    if pending:
+        ib.qualifyContracts(*pending)
+        mark_qualified(*also_qualify)
+    return fut_contract
+
+def get_option_chain(ib, expiry):
+    """
+    Return (sorted_strikes, {strike: contract}) for the MES calls of an expiry.
+    The chain is stable within a trading day, so it is fetched once per expiry;
+    contracts from reqContractDetails already carry their conId.
+    """
+    chain = _option_chain_cache.get(expiry)
+    if chain is None:
+        # Evict chains for expiries that have already passed
+        today = datetime.now(NY).strftime('%Y%m%d')
+        for old in [e for e in _option_chain_cache if e < today]:
+            del _option_chain_cache[old]
+        opt_filter = Contract(
+            symbol=UNDERLYING,
+            secType='FOP',
+            exchange='CME',
+            currency='USD',
+            lastTradeDateOrContractMonth=expiry,
+            right='C'
+        )
+        details = ib.reqContractDetails(opt_filter)
+        if not details:
+            raise Exception(f"No MES call options found for expiry {expiry}")
+        by_strike = {}
+        for d in details:
+            # Keep the first listing per strike, matching IB's detail order
+            by_strike.setdefault(d.contract.strike, d.contract)
+        chain = (sorted(by_strike), by_strike)
+        _option_chain_cache[expiry] = chain
+    return chain
+
+# ─── Streaming market data: one persistent subscription per contract ───
+_live_tickers = {}  # conId -> (contract, Ticker)
+
+def subscribe_ticker(ib, contract):
+    """
+    Return a streaming Ticker for contract, subscribing only if not already live.
+    """
+    entry = _live_tickers.get(contract.conId)
+    if entry is None:
+        entry = (contract, ib.reqMktData(contract, '', False, False))
+        _live_tickers[contract.conId] = entry
+    return entry[1]
+
+def unsubscribe_ticker(ib, contract):
+    """Cancel the streaming subscription for contract, if any."""
+    entry = _live_tickers.pop(getattr(contract, 'conId', 0), None)
+    if entry is not None:
+        try:
+            ib.cancelMktData(entry[0])
+        except Exception:
+            pass
+
+def live_ticker(contract):
+    """Return the streaming Ticker for contract, or None if not subscribed."""
+    entry = _live_tickers.get(getattr(contract, 'conId', 0))
+    return entry[1] if entry else None
+
+_quotes_changed = False  # set by pendingTickersEvent when a subscribed ticker updates
+
+def _on_pending_tickers(tickers):
+    """pendingTickersEvent handler: flag the main loop when one of our streams ticked."""
+    global _quotes_changed
+    for t in tickers:
+        if t.contract.conId in _live_tickers:
+            _quotes_changed = True
+            return
+
+def wait_for_quotes(ib, timeout):
+    """
+    Block until a subscribed ticker updates or timeout passes, ignoring unrelated IB
+    traffic (account values, order status). Returns True if a quote arrived.
+    """
+    global _quotes_changed
+    ticked = wait_for(ib, lambda: _quotes_changed, timeout)
+    _quotes_changed = False
+    return ticked
+
+def _to_quarter(x):
+    """Quantize x to the 0.25 MES tick, rounding half-ticks away from zero; NaN passes through."""
+    if x != x:
+        return x
+    return int(x * 4 + (0.5 if x >= 0 else -0.5)) * 0.25
+
 # ─── Fetch MES futures midpoint at fill time ───
 def fetch_mes_mid(ib):
     """
     Fetch the current MES futures midpoint (bid+ask)/2,
     with fallback to reqTickers if snapshot data is invalid.
     """
-    expiry, fut_month = get_expiry_and_future_expiry()
-    details = ib.reqContractDetails(Contract(
-        symbol=UNDERLYING, secType='FUT', exchange='CME', currency='USD'
-    ))
-    if not details:
-        raise Exception("No MES future contract found")
-    fut_contract = details[0].contract
-    ib.qualifyContracts(fut_contract)
-    # Primary: snapshot via reqMktData
-    ticker = ib.reqMktData(fut_contract, '', False, False)
-    ib.sleep(0.2)
+    fut_contract = get_mes_future(ib)
+    # Primary: persistent streaming ticker (only wait on first subscription)
+    ticker = live_ticker(fut_contract)
+    if ticker is None:
+        ticker = subscribe_ticker(ib, fut_contract)
+        wait_for(ib, lambda: quote_ready(ticker), 0.2)
     bid, ask = ticker.bid, ticker.ask
     # Fallback if invalid bid/ask
-    if bid is None or ask is None or bid <= 0 or ask <= bid:
+    if not _good_nbbo(bid, ask):
         tickers = ib.reqTickers(fut_contract)
         if tickers:
             tb = tickers[0]
-            ib.sleep(0.1)
             bid = tb.bid or bid or 0.0
             ask = tb.ask or ask or bid or 0.0
     # Compute midpoint
-    if bid is not None and ask is not None and ask > bid:
+    if _good_nbbo(bid, ask):
         mid = (bid + ask) / 2
         # quantize midpoint to 0.25 increments
-        return round(mid * 4) / 4
+        return _to_quarter(mid)
     # As a last resort, use last or close price
     last = ticker.last or ticker.close or float('nan')
     # quantize midpoint to 0.25 increments
-    last = round(last * 4) / 4
-    return float(last)
+    return float(_to_quarter(last))
 
 def connect_ib():
     ib = IB()
     ib.connect(IB_HOST, IB_PORT, clientId=CLIENT_ID)
     ib.errorEvent.clear()
     ib.errorEvent += lambda *args, **kwargs: None
+    # Push-driven state: quotes flag the main loop, positions keep the short-call map current
+    ib.pendingTickersEvent += _on_pending_tickers
+    ib.positionEvent += _on_position
+    resync_short_calls(ib)
     return ib
 
+def wait_for(ib, condition, timeout):
+    """
+    Block until condition() is true or timeout seconds pass, waking on each IB update
+    instead of sleeping a fixed interval. Returns the final condition() result.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        ib.waitOnUpdate(timeout=remaining)
+    return True
+
+def trade_settled(trade):
+    """True once a trade is cancelled/inactive, or filled with its executions reported."""
+    status = trade.orderStatus.status
+    return status in ('Cancelled', 'ApiCancelled', 'Inactive') \
+        or (status == 'Filled' and bool(trade.fills))
+
+def _price_ok(px):
+    """True for a real price: positive, not NaN and not IB's UNSET_DOUBLE placeholder."""
+    return px is not None and 0 < px < UNSET_DOUBLE
+
+def _limit_price(trade):
+    """The order's limit price, used as the fill-price fallback (NaN if there is no trade)."""
+    return trade.order.lmtPrice if trade is not None else float('nan')
+
+def _fill_price(trade, fallback):
+    """
+    Return (filled, price) for a trade: the last execution price, else avgFillPrice
+    or fallback once IB reports Filled. A Filled status with no usable price is
+    returned as (False, fallback) so callers never book a NaN/unset entry price.
+    """
+    if trade is None:
+        return False, fallback
+    fills = getattr(trade, 'fills', None)
+    if fills:
+        return True, fills[-1].execution.price
+    status = getattr(trade, 'orderStatus', None)
+    if status and status.status == 'Filled':
+        for px in (status.avgFillPrice, fallback):
+            if _price_ok(px):
+                return True, px
+    return False, fallback
+
+def _good_nbbo(bid, ask):
+    """True for a usable quote: both sides numeric (x == x rejects NaN), bid > 0 and ask > bid."""
+    return bid is not None and ask is not None and bid == bid and ask == ask \
+        and bid > 0 and ask > bid
+
+def _v(x):
+    """x if it is a real number, else None (x == x rejects NaN)."""
+    return x if (x is not None and x == x) else None
+
+def quote_ready(ticker):
+    """True once a ticker carries numeric bid and ask values."""
+    return _v(ticker.bid) is not None and _v(ticker.ask) is not None
+
 def get_mid_price(tick):
     """Compute midpoint from bid/ask."""
     if tick.bid is None or tick.ask is None:
         return None
     return (tick.bid + tick.ask) / 2
 
+def nearest_index(sorted_values, x):
+    """Index of the value closest to x in a sorted list (ties go to the lower value)."""
+    i = bisect.bisect_left(sorted_values, x)
+    if i == 0:
+        return 0
+    if i == len(sorted_values):
+        return i - 1
+    return i - 1 if (x - sorted_values[i - 1]) <= (sorted_values[i] - x) else i
+
 def find_atm_strike(ib, underlying_price, chain):
     """Find the strike in chain closest to the underlying price."""
     strikes = sorted(chain.strikes)
-    return min(strikes, key=lambda s: abs(s - underlying_price))
+    return strikes[nearest_index(strikes, underlying_price)]
 
 def choose_option_contract(ib, strike_offset=0):
     """
     Retrieves and qualifies the at-the-money MES short call via option chain metadata.
     """
     # After 8 AM, switch to next trading day only if today is Monday–Thursday
-    ny = ZoneInfo('America/New_York')
-    now = datetime.now(ny)
+    now = datetime.now(NY)
     if now.hour >= 8 and now.weekday() in (0, 1, 2, 3):
         # next calendar day, skip weekends
         next_day = now.date() + timedelta(days=1)
@@ -185,21 +667,10 @@ def choose_option_contract(ib, strike_offset=0):
         expiry, _ = get_expiry_and_future_expiry()
     # Get the reliable MES midpoint for ATM calculation
     price = fetch_mes_mid(ib)
-    # 2) Fetch all MES call options for today's expiry
-    opt_filter = Contract(
-        symbol=UNDERLYING,
-        secType='FOP',
-        exchange='CME',
-        currency='USD',
-        lastTradeDateOrContractMonth=expiry,
-        right='C'
-    )
-    details = ib.reqContractDetails(opt_filter)
-    if not details:
-        raise Exception(f"No MES call options found for expiry {expiry}")
+    # 2) Fetch all MES call options for today's expiry (cached per expiry)
+    strikes, by_strike = get_option_chain(ib, expiry)
     # Determine the target strike nearest to the future mid-price and apply offset
-    strikes = sorted({d.contract.strike for d in details})
-    atm_idx = min(range(len(strikes)), key=lambda i: abs(strikes[i] - price))
+    atm_idx = nearest_index(strikes, price)
     target_idx = atm_idx + strike_offset
     target_idx = max(0, min(target_idx, len(strikes) - 1))
     best_strike = strikes[target_idx]
@@ -208,13 +679,10 @@ def choose_option_contract(ib, strike_offset=0):
     #     best_strike = candidates[0]
     # else:
     #     best_strike = strikes[-1]
-    # 4) Find the contract matching that strike
-    for d in details:
-        c = d.contract
-        if getattr(c, 'strike', None) == best_strike:
-            ib.qualifyContracts(c)
-            return c
-    raise Exception(f"Failed to find MES call at strike {best_strike}")
+    # 4) Return the contract matching that strike (fully specified by reqContractDetails)
+    contract = by_strike[best_strike]
+    mark_qualified(contract)
+    return contract
 
 
 # ───────── Stepped Limit Order Helper ─────────
@@ -224,44 +692,43 @@ def place_stepped_limit(ib, contract, action, qty):
     """
     # Ensure we're only placing orders on options
     if getattr(contract, 'secType', None) != 'FOP':
-        print(f"⚠️ Skipping non-option contract: {getattr(contract, 'secType', 'UNKNOWN')}")
+        log.warning("⚠️ Skipping non-option contract: %s", getattr(contract, 'secType', 'UNKNOWN'))
         return None
     # ─── Ensure only one outstanding limit order ───
-    ib.reqOpenOrders()
-    for order_data in ib.openOrders():
+    # openTrades() is kept in sync by ib_insync's order events; openOrders() holds bare Orders
+    for order_data in ib.openTrades():
         o = order_data.order
         c = order_data.contract
         if getattr(c, 'conId', None) == getattr(contract, 'conId', None) \
            and o.action == action and getattr(o, 'orderType', '') == 'LMT':
-            print(f"⚠️ Cancelling existing {action} LMT order for {contract.localSymbol} at {o.lmtPrice}")
+            log.warning("⚠️ Cancelling existing %s LMT order for %s at %s", action, contract.localSymbol, o.lmtPrice)
             try:
                 ib.cancelOrder(o)
             except:
                 pass
-            ib.sleep(1)  # allow cancellation to propagate
+            # allow cancellation to propagate; returns as soon as IB confirms
+            wait_for(ib, lambda: trade_settled(order_data), 1.0)
     # ───────────────────────────────────────────────
     # Prevent double-short: skip SELL if a short call already exists
     if action == 'SELL':
-        ib.reqPositions()
         existing_shorts = [p for p in ib.positions()
                            if p.contract.secType == 'FOP'
                            and p.contract.symbol == UNDERLYING
                            and p.position < 0]
         if existing_shorts:
-            print(f"⚠️ Skipping new short call; existing: {existing_shorts[0].contract.localSymbol}")
+            log.warning("⚠️ Skipping new short call; existing: %s", existing_shorts[0].contract.localSymbol)
             return None
     # ─── Two-step IOC: threshold then NBBO fallback ───
-    with summary_lock:
-        summary_paused = True
-    md = ib.reqMktData(contract, '', False, True)
-    ib.sleep(0.5)  # allow snapshot to populate
+    # Reuse the live stream if the contract is already subscribed
+    md = live_ticker(contract)
+    if md is None:
+        # reqTickers blocks only until the snapshot completes, and ends its own request
+        md = ib.reqTickers(contract)[0]
     raw_bid = md.bid
     raw_ask = md.ask
     # Fallback if no valid NBBO: quick reqTickers()
-    if raw_bid is None or math.isnan(raw_bid) or raw_bid <= 0 \
-       or raw_ask is None or math.isnan(raw_ask) or raw_ask <= 0:
+    if not _good_nbbo(raw_bid, raw_ask):
         ticker_fb = ib.reqTickers(contract)[0]
-        ib.sleep(0.1)
         raw_bid = ticker_fb.bid or 0.0
         raw_ask = ticker_fb.ask or raw_bid
     bid, ask = raw_bid, raw_ask
@@ -273,40 +740,74 @@ def place_stepped_limit(ib, contract, action, qty):
         first_price = max(ask - threshold, bid)
     # 1) Place threshold GTC (explicitly cancel after delay if not filled)
     order1 = LimitOrder(action, qty, first_price, tif='GTC')
-    print(f"📝 Placed {action} IOC threshold order at ${first_price:.2f}")
+    log.info("📝 Placed %s IOC threshold order at $%.2f", action, first_price)
     trade1 = ib.placeOrder(contract, order1)
     # ─── Wait for threshold fill before fallback ───
-    print(f"⏳ Waiting {CANCELLATION_DELAY}s for threshold to fill before fallback")
-    ib.sleep(CANCELLATION_DELAY)
+    log.info("⏳ Waiting %ss for threshold to fill before fallback", CANCELLATION_DELAY)
+    wait_for(ib, lambda: trade_settled(trade1), CANCELLATION_DELAY)
     try:
         ib.cancelOrder(order1)
-        print(f"⚠️ Cancelled threshold order at ${first_price:.2f}")
+        log.warning("⚠️ Cancelled threshold order at $%.2f", first_price)
     except:
         pass
     # Check fill
-    filled1 = False
-    if hasattr(trade1, 'fills') and trade1.fills:
-        filled1 = True
-    elif getattr(trade1, 'orderStatus', None) and trade1.orderStatus.status == 'Filled':
-        filled1 = True
-    if filled1:
-        with summary_lock:
-            summary_paused = False
+    if _fill_price(trade1, first_price)[0]:
         return trade1
 
     # 2) Fallback: use Market‑to‑Limit for guaranteed execution with price cap
-    print(f"⚠️ Threshold did not fill; placing {action} Market‑to‑Limit fallback order")
+    log.warning("⚠️ Threshold did not fill; placing %s Market‑to‑Limit fallback order", action)
     order2 = MarketOrder(action, qty)
     # Flag MTL conversion (IBKR converts first fill price to limit)
     order2.orderType = 'MKT'
     order2.convertToLimit = True
     trade2 = ib.placeOrder(contract, order2)
     # Allow brief time for execution
-    ib.sleep(1)
-    with summary_lock:
-        summary_paused = False
+    wait_for(ib, lambda: trade_settled(trade2), 1.0)
     return trade2
 
+# ─── Cash balance TTL cache (busted after fills) ───
+CASH_CACHE_TTL = 30  # seconds a TotalCashBalance snapshot stays fresh
+_cash_cache = {'ts': 0.0, 'val': float('nan')}
+
+def get_cash_balance(ib, ttl=CASH_CACHE_TTL):
+    """
+    Return the USD TotalCashBalance, re-requesting the account summary only when
+    the cached value is older than ttl seconds or was invalidated by a fill.
+    """
+    if time.time() - _cash_cache['ts'] < ttl:
+        return _cash_cache['val']
+    ib.reqAccountSummary()  # refresh snapshot
+    _cash_cache['val'] = next((float(row.value) for row in ib.accountSummary()
+                               if row.tag == 'TotalCashBalance' and row.currency == 'USD'), float('nan'))
+    _cash_cache['ts'] = time.time()
+    return _cash_cache['val']
+
+def invalidate_cash_balance():
+    """Force the next get_cash_balance() call to refresh from IB."""
+    _cash_cache['ts'] = 0.0
+
+MAX_ROLL_SPREAD = 3.0  # widest option spread ($) accepted for a buy-to-close
+
+def _spread_ok(bid, ask):
+    """
+    Sanitize a quote (None/NaN bid -> 0.0, missing ask -> bid) and check its spread.
+    Returns (ok, spread, bid, ask) where ok means 0 < spread <= MAX_ROLL_SPREAD.
+    """
+    bid = _v(bid) or 0.0
+    ask = _v(ask)
+    if ask is None:
+        ask = bid
+    spread = ask - bid
+    return 0 < spread <= MAX_ROLL_SPREAD, spread, bid, ask
+
+def _mult(c):
+    """Contract multiplier as an int, parsed from the string field once and cached on the contract."""
+    m = getattr(c, '_mult_cached', None)
+    if m is None:
+        m = int(c.multiplier)
+        c._mult_cached = m
+    return m
+
 def calc_pnl_percent(entry_price, current_price, multiplier=1):
     """
     PnL percent for a short call:
@@ -325,21 +826,131 @@ def roll_position(ib, old_trade, new_contract):
     # 2) Open new
     return place_short_call(ib, new_contract)
 
+_short_calls = {}  # localSymbol -> Position for open UNDERLYING short calls, kept current by positionEvent
+
+def _on_position(position):
+    """positionEvent handler: add, update or drop one entry of the short-call map."""
+    c = position.contract
+    # Same filter as place_stepped_limit / ensure_single_short_call: only our MES calls drive rolls
+    if c.secType == 'FOP' and c.symbol == UNDERLYING and position.position < 0:
+        _short_calls[c.localSymbol] = position
+    else:
+        _short_calls.pop(c.localSymbol, None)
+
+def resync_short_calls(ib):
+    """Rebuild the short-call map from ib_insync's position cache (after a (re)connect)."""
+    _short_calls.clear()
+    for p in ib.positions():
+        _on_position(p)
+
+def short_calls_by_symbol():
+    """
+    Snapshot (copy) of localSymbol -> Position for open short calls on UNDERLYING.
+    The live map is maintained by positionEvent, so this is a small dict copy rather
+    than a rescan of ib.positions(); callers may iterate it across waitOnUpdate safely.
+    """
+    return dict(_short_calls)
+
 def ensure_single_short_call(ib):
     """
     Ensures that there is at most one short call open.
     Closes any extras if more than one is found.
     """
-    ib.reqPositions()
     positions = ib.positions()
     short_calls = [p for p in positions if p.contract.secType == 'FOP'
                    and p.contract.symbol == UNDERLYING and p.position < 0]
     # Close any extra short calls beyond the first
     if len(short_calls) > 1:
         for extra in short_calls[1:]:
-            print(f"⚠️ Closing extra short call: {extra.contract.localSymbol}")
-            ib.placeOrder(extra.contract, MarketOrder('BUY', abs(extra.position)))
-            ib.sleep(1)
+            log.warning("⚠️ Closing extra short call: %s", extra.contract.localSymbol)
+            t = ib.placeOrder(extra.contract, MarketOrder('BUY', abs(extra.position)))
+            wait_for(ib, lambda: trade_settled(t), 1.0)
+
+def _execute_roll(ib, contract, positions_by_symbol, strike_delta, base_mes_price, tag):
+    """
+    Roll the short call: buy-to-close contract, then sell-to-open the call
+    strike_delta strikes from ATM (negative rolls DOWN, positive rolls UP).
+    Returns (trade, rolled): trade is the last order placed (the SELL once it is sent,
+    None if nothing was sent) so the caller's in-flight guard can wait on a working
+    fallback; rolled is (new_contract, entry_px, multiplier, base_mes_price), or None
+    if the roll was skipped or did not complete and the caller retries next loop.
+    """
+    placed = None
+    _paused_event.set()
+    try:
+        # 1) Buy to close existing short call
+        log.info('📤 Buying to close short call')
+        # Show current call spread before BUY-to-close
+        bc_ticker = ib.reqTickers(contract)[0]
+        # Treat None or NaN bids/asks as zero and check the spread in one place
+        ok, spread_bc, bid_bc, ask_bc = _spread_ok(bc_ticker.bid, bc_ticker.ask)
+        log.info("⚖️ Call spread before BUY-to-close: %.2f (bid %.2f / ask %.2f)", spread_bc, bid_bc, ask_bc)
+        # ─── Skip buy-to-close on an invalid quote or a spread too wide to trade ───
+        if not ok:
+            reason = "≤ 0; invalid quote" if spread_bc <= 0 else f"> {MAX_ROLL_SPREAD}; spread too wide"
+            log.warning("⚠️ Spread %.2f %s, skipping buy-to-close and roll-%s", spread_bc, reason, tag)
+            if ib.isConnected():
+                ib.sleep(CHECK_INTERVAL)
+            return placed, None
+        # Ensure contract has up-to-date conId and localSymbol (once per contract)
+        ensure_qualified(ib, contract)
+        pos_to_close = positions_by_symbol.get(contract.localSymbol)
+        if not pos_to_close:
+            log.warning("⚠️ No short call position found for %s, skipping close", contract.localSymbol)
+            if ib.isConnected():
+                ib.sleep(CHECK_INTERVAL)
+            return placed, None
+        trade_close = placed = place_stepped_limit(ib, contract, 'BUY', abs(pos_to_close.position))
+        filled, fill_px = _fill_price(trade_close, _limit_price(trade_close))
+        if not filled:
+            log.warning("⚠️ Close did not fill within timeout; no confirmation of fill.")
+            if ib.isConnected():
+                ib.sleep(CHECK_INTERVAL)
+            return placed, None
+        log.info("✅ Closed short call %s at $%.2f", contract.localSymbol, fill_px)
+        invalidate_cash_balance()
+        # 2) Sell to open new short call
+        log.info('📥 Selling to open new short call')
+        # Show current call spread before SELL-to-open
+        new_contract = choose_option_contract(ib, strike_delta)
+        so_ticker = ib.reqTickers(new_contract)[0]
+        bid_so = so_ticker.bid or 0.0
+        ask_so = so_ticker.ask or bid_so
+        spread_so = ask_so - bid_so
+        log.info("⚖️ Call spread before SELL-to-open: %.2f (bid %.2f / ask %.2f)", spread_so, bid_so, ask_so)
+        trade = placed = place_stepped_limit(ib, new_contract, 'SELL', 1)
+        # Ensure only one short call after rolling (place_stepped_limit already refuses a second SELL)
+        ensure_single_short_call(ib)
+        # fallback if no fill
+        filled, fill_px = _fill_price(trade, _limit_price(trade))
+        if not filled:
+            log.warning("⚠️ Market‑to‑Limit fallback did not fill; will retry next loop")
+            if ib.isConnected():
+                ib.sleep(CHECK_INTERVAL)
+            return placed, None
+        log.info("✅ Opened new short call: %s at $%.2f", trade.contract.localSymbol, fill_px)
+        invalidate_cash_balance()
+        # Clear stale summary to prevent printing old data
+        clear_summary()
+        # Stamp new baseline MES at roll fill
+        mid = fetch_mes_mid(ib)
+        if mid == mid:
+            base_mes_price = mid
+            save_base_mes_price(base_mes_price)
+            # Increment roll count (keys computed once per day, shared with the summary)
+            today, week_key = roll_count_keys()
+            daily_rolls, weekly_rolls = increment_roll_counts(today, week_key)
+            log.info("📊 Rolls today (%s): %s, this week (%s): %s", today, daily_rolls, week_key, weekly_rolls)
+            publish_summary(price=base_mes_price, strike=trade.contract.strike,
+                            exp=trade.contract.lastTradeDateOrContractMonth, just_filled=True)
+            skip_summary()
+        else:
+            log.warning("⚠️ Failed to fetch valid MES mid at fill; baseline remains unchanged")
+        contract = trade.contract
+        return trade, (contract, fill_px, _mult(contract), base_mes_price)
+    finally:
+        # Never leave the summary paused after a skipped or failed roll
+        _paused_event.clear()
 
 # ───────── MAIN LOOP ─────────
 
@@ -348,97 +959,92 @@ def summary_thread():
     """Print latest summary_data every 2 s, but only full summary when MES price changes."""
     last_rt_price = None
     waiting_printed = False
-    global skip_summary_count
+    last_exp, exp_date = None, ''  # formatted expiry, refreshed only when it changes
     while True:
         time.sleep(2)
-        ts = datetime.now(ZoneInfo('America/New_York')).strftime('%H:%M:%S')
-        with summary_lock:
-            if skip_summary_count > 0:
-                skip_summary_count -= 1
-                continue
-            if summary_paused or not summary_data:
-                continue
-            expected_keys = {'mes_rt_price','price','strike','bid','ask','spread',
-                             'fut_bid','fut_ask','cost','pnl','pnl_pct','cash',
-                             'pct_to_profit','pct_to_loss','down_left','up_left'}
-            if not expected_keys.issubset(summary_data.keys()):
-                continue
-            d = summary_data
-            mes_rt = d.get('mes_rt_price', d.get('price', 0.0))
-            if mes_rt == last_rt_price:
-                if not waiting_printed:
-                    print(f"👀 {ts} waiting for market to update")
-                    waiting_printed = True
-                continue
-            last_rt_price = mes_rt
-            # Grouped summary
-            exp_date = datetime.strptime(d['exp'], '%Y%m%d').strftime('%b %d, %Y')
-            print(f"🕒 {ts} | MES: {mes_rt:.2f} | Option Strike: {d['strike']} | EXP ({exp_date})")
-            print(f"📈 Bid/Ask: {d['bid']} / {d['ask']} |Spread: {d['spread']:.2f}")
-            print(f"📊 Cost basis (💵 Credit received): ${d['cost']:.2f}")
-            print(f"💰 P/L: ${d['pnl']:.2f} ({d['pnl_pct']:.1f}%)")
-            print(f"💵 Cash balance: ${d['cash']:.2f}")
-            # Display daily and weekly roll counts
-            roll_counts = load_roll_counts()
-            today = datetime.now(ZoneInfo('America/New_York')).strftime('%Y-%m-%d')
-            week = datetime.now(ZoneInfo('America/New_York')).isocalendar()
-            week_key = f"{week[0]}-W{week[1]:02d}"
-            daily_rolls = roll_counts['daily'].get(today, 0)
-            weekly_rolls = roll_counts['weekly'].get(week_key, 0)
-            print(f"🔄 Rolls today: {daily_rolls}, this week: {weekly_rolls}")
-            print(f"⏳ Waiting to roll... (+{PROFIT_TARGET}% / {LOSS_LIMIT}%)")
-            print(f"   ↳ {d['pct_to_profit']:.1f}% until profit target, {d['pct_to_loss']:.1f}% until loss limit")
-            print(f"   ↳ {d['down_left']:.2f} pts until roll DOWN, "
-                  f"MES Price at fill: {d['price']:.2f}, "
-                  f"{d['up_left']:.2f} pts until roll UP")
-            # Countdown until market close (17:00 ET) on weekdays
-            now = datetime.now(ZoneInfo('America/New_York'))
-            if now.weekday() < 5 and now.time() < dt_time(17, 0):
-                close_dt = datetime.combine(now.date(), dt_time(17, 0), ZoneInfo('America/New_York'))
-                delta = close_dt - now
-                hrs, rem = divmod(int(delta.total_seconds()), 3600)
-                mins, secs = divmod(rem, 60)
-                print(f"⏰ Market closes in {hrs}h {mins}m {secs}s")
-            else:
-                # Countdown until next market open
-                now2 = datetime.now(ZoneInfo('America/New_York'))
-                # Determine next open datetime (CME MES: Sunday 18:00 ET, weekdays 18:00->17:00 daily maintenance)
-                def next_open_time(n):
-                    # Friday after 17:00 or Saturday: next Sunday 18:00
-                    w, t = n.weekday(), n.time()
-                    if (w == 4 and t >= dt_time(17, 0)) or w == 5:
-                        # days until Sunday
-                        days_ahead = (6 - w) % 7
-                        sunday = n.date() + timedelta(days=days_ahead)
-                        return datetime.combine(sunday, dt_time(18, 0), ZoneInfo('America/New_York'))
-                    # Sunday before 18:00
-                    if w == 6 and t < dt_time(18, 0):
-                        return datetime.combine(n.date(), dt_time(18, 0), ZoneInfo('America/New_York'))
-                    # Daily maintenance window (17:00-18:00)
-                    if dt_time(17, 0) <= t < dt_time(18, 0):
-                        return datetime.combine(n.date(), dt_time(18, 0), ZoneInfo('America/New_York'))
-                    # Otherwise market is open (shouldn't hit here)
-                    return n
-                reopen_dt = next_open_time(now2)
-                delta2 = reopen_dt - now2
-                hrs2, rem2 = divmod(int(delta2.total_seconds()), 3600)
-                mins2, secs2 = divmod(rem2, 60)
-                print(f"⏰ Market reopens in {hrs2}h {mins2}m {secs2}s")
-            print("─" * 60)
-            waiting_printed = False
+        now = datetime.now(NY)
+        ts = f"{now.hour:02d}:{now.minute:02d}:{now.second:02d}"
+        if time.monotonic() < _summary_resume_at:
+            continue
+        # Grab the published snapshot once; it is never mutated after publication
+        d = summary_data
+        if _paused_event.is_set() or not d:
+            continue
+        if not _SUMMARY_REQUIRED_KEYS.issubset(d):
+            continue
+        mes_rt = d.get('mes_rt_price', d.get('price', 0.0))
+        if mes_rt == last_rt_price:
+            if not waiting_printed:
+                log.info("👀 %s waiting for market to update", ts)
+                waiting_printed = True
+            continue
+        last_rt_price = mes_rt
+        # Grouped summary
+        if d['exp'] != last_exp:
+            last_exp = d['exp']
+            exp_date = datetime.strptime(last_exp, '%Y%m%d').strftime('%b %d, %Y')
+        lines = [f"🕒 {ts} | MES: {mes_rt:.2f} | Option Strike: {d['strike']} | EXP ({exp_date})"]
+        out = lines.append
+        out(f"📈 Bid/Ask: {d['bid']} / {d['ask']} |Spread: {d['spread']:.2f}")
+        out(f"📊 Cost basis (💵 Credit received): ${d['cost']:.2f}")
+        out(f"💰 P/L: ${d['pnl']:.2f} ({d['pnl_pct']:.1f}%)")
+        out(f"💵 Cash balance: ${d['cash']:.2f}")
+        # Display daily and weekly roll counts
+        today, week_key = roll_count_keys()
+        daily_rolls = _daily_rolls[today]
+        weekly_rolls = _weekly_rolls[week_key]
+        out(f"🔄 Rolls today: {daily_rolls}, this week: {weekly_rolls}")
+        out(f"⏳ Waiting to roll... (+{PROFIT_TARGET}% / {LOSS_LIMIT}%)")
+        out(f"   ↳ {d['pct_to_profit']:.1f}% until profit target, {d['pct_to_loss']:.1f}% until loss limit")
+        out(f"   ↳ {d['down_left']:.2f} pts until roll DOWN, "
+            f"MES Price at fill: {d['price']:.2f}, "
+            f"{d['up_left']:.2f} pts until roll UP")
+        # Countdown until market close (17:00 ET) on weekdays
+        if now.weekday() < 5 and now.time() < MKT_CLOSE:
+            close_dt = datetime.combine(now.date(), MKT_CLOSE, NY)
+            delta = close_dt - now
+            hrs, rem = divmod(int(delta.total_seconds()), 3600)
+            mins, secs = divmod(rem, 60)
+            out(f"⏰ Market closes in {hrs}h {mins}m {secs}s")
+        else:
+            # Countdown until next market open
+            reopen_dt = next_open_time(now)
+            delta2 = reopen_dt - now
+            hrs2, rem2 = divmod(int(delta2.total_seconds()), 3600)
+            mins2, secs2 = divmod(rem2, 60)
+            out(f"⏰ Market reopens in {hrs2}h {mins2}m {secs2}s")
+        out("─" * 60)
+        # One record (a single write on the log thread) per tick instead of a syscall per line
+        log.info('\n'.join(lines))
+        waiting_printed = False
 
 # Start summary printer daemon
 threading.Thread(target=summary_thread, daemon=True).start()
+# Start background persistence flusher
+threading.Thread(target=persist_flusher, daemon=True).start()
 
 def run_bot():
-    global LAST_PRINTED_PNL, LAST_PRINTED_SPREAD, summary_paused, skip_summary_count
-    # Load or initialize roll counts
-    roll_counts = load_roll_counts()
+    """Connect to IB and trade until an error; the session is always disconnected on the way out."""
+    ib = connect_ib()
+    try:
+        _run_bot(ib)
+    finally:
+        # Release CLIENT_ID so the restart loop's next connect is not rejected as already in use
+        try:
+            ib.disconnect()
+        except Exception:
+            pass
+
+def _run_bot(ib):
+    global LAST_PRINTED_PNL, LAST_PRINTED_SPREAD
     # Attempt to restore baseline MES price from previous run
-    base_mes_price = load_base_mes_price()
     # Track MES price at time of initial short for hybrid roll logic
-    ib = connect_ib()
-    print('✅ Connected to IB Gateway.')
+    base_mes_price = load_base_mes_price()
+    # Daily/weekly roll counts come from the append-only roll log
+    init_roll_counts()
+    # Subscriptions from a previous connection are gone
+    _live_tickers.clear()
+    log.info('✅ Connected to IB Gateway.')
     # Reset summary state on restart
     LAST_PRINTED_PNL = None
     LAST_PRINTED_SPREAD = None
@@ -448,136 +1054,92 @@ def run_bot():
     roll_enable_time = 0
 
     # ─── Cancel any existing open MES option orders ───
+    # Sync orders and positions once; ib_insync keeps ib.openTrades()/ib.positions()
+    # current from its order and position events afterwards
     ib.reqOpenOrders()
     # ib.openOrders() returns Order objects; use openTrades() for contract info
+    cancelled = []
     for trade in ib.openTrades():
         o = trade.order
         c = trade.contract
         if c.secType == 'FOP' and c.symbol == UNDERLYING and o.action in ('BUY', 'SELL'):
-            print(f"⚠️ Cancelling stale order: {o.action} {c.localSymbol} LMT {o.lmtPrice}")
+            log.warning("⚠️ Cancelling stale order: %s %s LMT %s", o.action, c.localSymbol, o.lmtPrice)
             try:
-                ib.cancelOrder(o)
+                cancelled.append(ib.cancelOrder(o))
             except:
                 pass
-    ib.sleep(1)
+    wait_for(ib, lambda: all(trade_settled(t) for t in cancelled if t), 1.0)
     # ─── Close any stray long call positions ───
     ib.reqPositions()
     for pos in ib.positions():
         c = pos.contract
         # If a floating long call exists, close it
         if c.secType == 'FOP' and c.symbol == UNDERLYING and pos.position > 0:
-            print(f"⚠️ Closing extra floating long call: {c.localSymbol}")
-            ib.placeOrder(c, MarketOrder('SELL', pos.position))
-            ib.sleep(1)
+            log.warning("⚠️ Closing extra floating long call: %s", c.localSymbol)
+            t = ib.placeOrder(c, MarketOrder('SELL', pos.position))
+            wait_for(ib, lambda: trade_settled(t), 1.0)
     # ───────────────────────────────────────────
 
     # Drift correction: ensure only one short call per long futures contract
-    ib.reqPositions()
     positions = ib.positions()
     long_futs = [p for p in positions if p.contract.secType == 'FUT' and p.contract.symbol == UNDERLYING and p.position > 0]
     short_calls = [p for p in positions if p.contract.secType == 'FOP' and p.contract.symbol == UNDERLYING and p.position < 0]
     # Close any extra short calls
     if len(short_calls) > len(long_futs):
         for extra in short_calls[len(long_futs):]:
-            print(f"⚠️ Closing extra short call: {extra.contract.localSymbol}")
-            ib.placeOrder(extra.contract, MarketOrder('BUY', abs(extra.position)))
-            ib.sleep(1)
+            log.warning("⚠️ Closing extra short call: %s", extra.contract.localSymbol)
+            t = ib.placeOrder(extra.contract, MarketOrder('BUY', abs(extra.position)))
+            wait_for(ib, lambda: trade_settled(t), 1.0)
 
     # 1) Ensure an open short call exists, retrying until successful
     while True:
         # ─── Enforce CME trading hours & maintenance ───
-        ny = ZoneInfo('America/New_York')
-        now_dt = datetime.now(ny)
+        now_dt = datetime.now(NY)
         now_t = now_dt.time()
         wkd = now_dt.weekday()  # Monday=0 ... Friday=4, Saturday=5, Sunday=6
 
-        def next_open_time(now_dt):
-            """
-            Return the next datetime (NY time) when CME MES re-opens.
-            """
-            ny = ZoneInfo('America/New_York')
-            today = now_dt.date()
-            t = now_dt.time()
-            wkd = now_dt.weekday()
-            # Friday after 17:00 → Sunday 18:00
-            if (wkd == 4 and t >= dt_time(17, 0)) or wkd == 5:
-                # Advance to Sunday
-                days_ahead = (6 - wkd) % 7  # days until Sunday
-                sunday = today + timedelta(days=days_ahead)
-                return datetime.combine(sunday, dt_time(18, 0), ny)
-            # Sunday before 18:00
-            if wkd == 6 and t < dt_time(18, 0):
-                return datetime.combine(today, dt_time(18, 0), ny)
-            # Daily maintenance 17:00‑18:00
-            if dt_time(17, 0) <= t < dt_time(18, 0):
-                return datetime.combine(today, dt_time(18, 0), ny)
-            # Otherwise we're open now
-            return now_dt
-
-        # Determine if in closed window:
-        closed = (
-            # Saturday always closed
-            wkd == 5 or
-            # Sunday before 18:00 ET closed
-            (wkd == 6 and now_t < dt_time(18, 0)) or
-            # Friday after 17:00 ET closed
-            (wkd == 4 and now_t >= dt_time(17, 0)) or
-            # Daily maintenance 17:00-18:00 ET
-            (now_t >= dt_time(17, 0) and now_t < dt_time(18, 0))
-        )
+        # Determine if in closed window (cached until the next open/close boundary)
+        closed = market_closed(now_dt)
         if closed:
             nxt = next_open_time(now_dt)
             delta = nxt - now_dt
             hours, rem = divmod(int(delta.total_seconds()), 3600)
             minutes = rem // 60
-            print(f"⏰ Market closed; reopening in {hours}h {minutes}m (at {nxt.strftime('%Y-%m-%d %H:%M ET')})")
+            log.info("⏰ Market closed; reopening in %sh %sm (at %s)", hours, minutes, nxt.strftime('%Y-%m-%d %H:%M ET'))
             # Only auto‑flatten before the WEEKEND: Friday 16:50–17:00 ET
-            if wkd == 4 and dt_time(16, 50) <= now_t < dt_time(17, 0):
-                print("⚠️ Auto‑flattening positions ahead of weekend close")
-                ib.reqPositions()
+            if wkd == 4 and FLATTEN_START <= now_t < MKT_CLOSE:
+                log.warning("⚠️ Auto‑flattening positions ahead of weekend close")
                 for pos in ib.positions():
                     c = pos.contract
                     qty = pos.position
                     if c.secType in ('FOP', 'FUT') and c.symbol == UNDERLYING and qty != 0:
                         action = 'BUY' if qty < 0 else 'SELL'
-                        print(f"⚠️ Closing position: {action} {c.localSymbol} qty {abs(qty)}")
+                        log.warning("⚠️ Closing position: %s %s qty %s", action, c.localSymbol, abs(qty))
                         order = MarketOrder(action, abs(qty))
-                        ib.placeOrder(c, order)
-                        ib.sleep(1)
+                        t = ib.placeOrder(c, order)
+                        wait_for(ib, lambda: trade_settled(t), 1.0)
             else:
-                print("ℹ️ Maintenance window—holding positions, no auto‑flatten.")
+                log.info("ℹ️ Maintenance window—holding positions, no auto‑flatten.")
             # Sleep until next check
             time.sleep(300)  # sleep 5 minutes before re-check
             continue
-        close_filled = False
-        ib.reqPositions()
         positions = ib.positions()
         short_positions = [p for p in positions if p.contract.secType == 'FOP'
                            and p.contract.symbol == UNDERLYING and p.position < 0]
         if short_positions:
             # Reuse the first existing short call
             existing = short_positions[0].contract
-            ib.qualifyContracts(existing)
+            # Qualify the reused call and the MES future in one request
+            fut_contract = get_mes_future(ib, existing)
             contract = existing
-            multiplier = int(contract.multiplier)
+            multiplier = _mult(contract)
             avg_cost_total = short_positions[0].avgCost
             entry_px = abs(avg_cost_total) / multiplier
-            print(f"🔍 Reusing open short call: {contract.localSymbol} @ ${entry_px:.2f}")
+            log.info("🔍 Reusing open short call: %s @ $%.2f", contract.localSymbol, entry_px)
             # Only set baseline if not already loaded from previous run
             if base_mes_price is None:
-                expiry, fut_month = get_expiry_and_future_expiry()
-                fut_details = ib.reqContractDetails(Contract(
-                    symbol=UNDERLYING,
-                    secType='FUT',
-                    exchange='CME',
-                    currency='USD'
-                ))
-                if not fut_details:
-                    raise Exception(f"No MES future contract found")
-                fut_contract = fut_details[0].contract
-                ib.qualifyContracts(fut_contract)
-                fut_ticker = ib.reqMktData(fut_contract, '', False, True)
-                ib.sleep(0.2)
+                fut_ticker = subscribe_ticker(ib, fut_contract)
+                wait_for(ib, lambda: quote_ready(fut_ticker), 0.2)
                 base_mes_price = (fut_ticker.bid + fut_ticker.ask) / 2 \
                                   if (fut_ticker.bid is not None and fut_ticker.ask is not None) \
                                   else float('nan')
@@ -588,68 +1150,58 @@ def run_bot():
         else:
             # No open short—attempt to open one
             implied_contract = choose_option_contract(ib, strike_offset=0)
-            ensure_single_short_call(ib)
             trade = place_stepped_limit(ib, implied_contract, 'SELL', 1)
             ensure_single_short_call(ib)
-            if trade and hasattr(trade, 'fills') and trade.fills:
+            filled, fill_px = _fill_price(trade, _limit_price(trade))
+            if filled:
                 contract = trade.contract
-                entry_px = trade.fills[-1].execution.price
-                multiplier = int(contract.multiplier)
-                print(f"🎉 Short Call Opened: {contract.localSymbol} sold at ${entry_px:.2f}")
+                entry_px = fill_px
+                multiplier = _mult(contract)
+                log.info("🎉 Short Call Opened: %s sold at $%.2f", contract.localSymbol, entry_px)
                 # Capture baseline MES exactly at fill
                 mid = fetch_mes_mid(ib)
-                if not math.isnan(mid):
+                if mid == mid:
                     base_mes_price = mid
                     save_base_mes_price(base_mes_price)
-                    with summary_lock:
-                        summary_data['price'] = base_mes_price
-                        summary_data['strike'] = contract.strike
-                        summary_data['exp'] = contract.lastTradeDateOrContractMonth
-                        summary_data['just_filled'] = True
-                        skip_summary_count = 2
+                    publish_summary(price=base_mes_price, strike=contract.strike,
+                                    exp=contract.lastTradeDateOrContractMonth, just_filled=True)
+                    skip_summary()
                 else:
-                    print("⚠️ Failed to fetch valid MES mid at fill; baseline remains unchanged")
+                    log.warning("⚠️ Failed to fetch valid MES mid at fill; baseline remains unchanged")
                 ib.sleep(CHECK_INTERVAL)
                 roll_enable_time = time.time() + CHECK_INTERVAL
                 break
             else:
-                print("⚠️ Short call did not open; retrying in next interval.")
+                log.warning("⚠️ Short call did not open; retrying in next interval.")
                 ib.sleep(CHECK_INTERVAL)
                 continue
 
     # Unpause summary after initial short is confirmed
-    with summary_lock:
-        summary_paused = False
+    _paused_event.clear()
 
     # Confirm short call position via existing positions
-    ib.reqPositions()
     positions = ib.positions()
     for pos in positions:
         if pos.contract.localSymbol == contract.localSymbol and pos.position < 0:
             break
 
-    # Subscribe to underlying MES futures price via reqContractDetails
-    expiry, fut_month = get_expiry_and_future_expiry()
-    fut_details = ib.reqContractDetails(Contract(
-        symbol=UNDERLYING,
-        secType='FUT',
-        exchange='CME',
-        currency='USD'
-    ))
-    if not fut_details:
-        raise Exception(f"No MES future contract found")
-    fut_contract = fut_details[0].contract
-    ib.qualifyContracts(fut_contract)
+    # Subscribe to underlying MES futures price (cached qualified contract)
+    fut_contract = get_mes_future(ib)
+    # Persistent streaming subscriptions, read directly each loop
+    opt_ticker = subscribe_ticker(ib, contract)
+    fut_ticker = subscribe_ticker(ib, fut_contract)
+    # Cost basis and its reciprocal change only on a new fill; precompute for the PnL check
+    cost_basis = entry_px * multiplier
+    inv_cost = 1.0 / cost_basis if cost_basis > 0 else 0.0
 
     while True:
-        close_filled = False
         # ─── Delay roll logic until cooldown expires ───
         if time.time() < roll_enable_time:
             ib.sleep(CHECK_INTERVAL)
             continue
         # ─── Connection watchdog ───
         if not ib.isConnected():
-            print("❌ Disconnected from IB; attempting to reconnect...")
+            log.error("❌ Disconnected from IB; attempting to reconnect...")
             while not ib.isConnected():
                 try:
                     ib.disconnect()  # ensure clean state
@@ -658,124 +1210,111 @@ def run_bot():
                 try:
                     ib.connect(IB_HOST, IB_PORT, clientId=CLIENT_ID)
                 except Exception as e:
-                    print(f"   ❌ Reconnect failed: {e}; retrying in 1s")
+                    log.error("   ❌ Reconnect failed: %s; retrying in 1s", e)
                     time.sleep(1)
                     continue
-                print("✅ Reconnected to IB.")
-            # Immediately fetch fresh market data on reconnect
-            ib.reqTickers(contract, fut_contract)
+                log.info("✅ Reconnected to IB.")
+            # Positions closed while disconnected emit no event; rebuild the map
+            resync_short_calls(ib)
+            # Refresh both contracts with a single batched qualification
+            ib.qualifyContracts(contract, fut_contract)
+            mark_qualified(contract)
+            # Streaming subscriptions do not survive a reconnect; resubscribe
+            _live_tickers.clear()
+            opt_ticker = subscribe_ticker(ib, contract)
+            fut_ticker = subscribe_ticker(ib, fut_contract)
             # Skip normal sleep to resume data polling right away
         # ───────────────────────────
         # ─── Skip printing while an order is in-flight (only pause on truly pending states) ───
-        if trade and hasattr(trade, 'orderStatus') and trade.orderStatus.status not in ('Filled', 'Cancelled'):
+        if trade and hasattr(trade, 'orderStatus') and \
+                trade.orderStatus.status not in ('Filled', 'Cancelled', 'ApiCancelled', 'Inactive'):
             if ib.isConnected():
                 ib.sleep(CHECK_INTERVAL)
             continue
         # ────────────────────────────────────────────────────────────────────────────────────
-        # 1) Fetch fresh tickers snapshot for option and future
-        tickers = ib.reqTickers(contract, fut_contract)
-        if len(tickers) != 2:
-            print("⚠️ Warning: reqTickers did not return both contract tickers")
-            if ib.isConnected():
-                ib.sleep(1)
-            continue
-        opt_ticker, fut_ticker = tickers
-        # Guard against invalid NBBO; fallback to fresh snapshot if needed
-        raw_bid = opt_ticker.bid
-        raw_ask = opt_ticker.ask
-        if raw_bid is None or raw_bid <= 0 or raw_ask is None or raw_ask <= raw_bid:
-            md = ib.reqMktData(contract, '', False, True)
-            ib.sleep(0.05)
-            raw_bid = md.bid
-            raw_ask = md.ask
-        # Normalize bids/asks
-        bid = raw_bid if (raw_bid is not None and raw_bid > 0) else 0.0
-        ask = raw_ask if (raw_ask is not None and raw_ask > bid) else bid
+        # 1) Read the latest future quote and the short-call position first: restoring a
+        # missing short must never be blocked by a bad option quote
         fut_bid = fut_ticker.bid
         fut_ask = fut_ticker.ask
-        # 3) Calculate metrics
         mes_price = fut_ticker.last if fut_ticker.last is not None else fut_ticker.close or float('nan')
         # Initialize baseline if invalid
-        if base_mes_price is None or (isinstance(base_mes_price, float) and math.isnan(base_mes_price)):
+        if base_mes_price is None or base_mes_price != base_mes_price:
             base_mes_price = mes_price
-        option_mid = (bid + ask) / 2 if (bid is not None and ask is not None) else float('nan')
-        # Retrieve the live position's average cost from IB (total dollars paid, per contract)
-        ib.reqPositions()
-        positions = ib.positions()
-        short_positions = [
-            p for p in positions
-            if p.contract.secType == 'FOP'
-            and p.contract.localSymbol == contract.localSymbol
-            and p.position < 0
-        ]
-        if short_positions:
-            pos = short_positions[0]
-            # avgCost on a short call is negative total premium received; invert sign for basis
-            avg_cost_total = abs(pos.avgCost)
-            cost_basis = avg_cost_total
-            entry_px = avg_cost_total / multiplier
-        # Recalculate PnL using the true basis
-        unreal = (entry_px - option_mid) * multiplier
-        pnl_pct = (unreal / cost_basis) * 100 if cost_basis else 0.0
-        spread = ask - bid
-        # --- Compute move from baseline MES price ---
-        move_down = max(0, base_mes_price - mes_price)
-        move_up   = max(0, mes_price - base_mes_price)
+        # One pass over the cached positions per iteration; lookups below are O(1)
+        positions_by_symbol = short_calls_by_symbol()
+        pos = positions_by_symbol.get(contract.localSymbol)
         # ─── Ensure a short call exists before proceeding ───
-        ib.reqPositions()
-        positions = ib.positions()
-        short_positions = [
-            p for p in positions
-            if p.contract.secType == 'FOP'
-            and p.contract.localSymbol == contract.localSymbol
-            and p.position < 0
-        ]
-        if not short_positions:
-            with summary_lock:
-                summary_paused = True
-            print("⚠️ No short call detected; selling ATM+1 to restore position")
+        if not pos:
+            _paused_event.set()
+            log.warning("⚠️ No short call detected; selling ATM+1 to restore position")
             # Sell an ATM+1 strike
             atm_plus1 = choose_option_contract(ib, strike_offset=1)
-            ensure_single_short_call(ib)
             trade = place_stepped_limit(ib, atm_plus1, 'SELL', 1)
             ensure_single_short_call(ib)
-            if trade and hasattr(trade, 'fills') and trade.fills:
-                fill_px = trade.fills[-1].execution.price
-                print(f"✅ Restored short call: {trade.contract.localSymbol} at ${fill_px:.2f}")
+            filled, fill_px = _fill_price(trade, _limit_price(trade))
+            if filled:
+                log.info("✅ Restored short call: %s at $%.2f", trade.contract.localSymbol, fill_px)
+                invalidate_cash_balance()
+                unsubscribe_ticker(ib, contract)
                 contract = trade.contract
+                opt_ticker = subscribe_ticker(ib, contract)
                 entry_px = fill_px
-                multiplier = int(contract.multiplier)
+                multiplier = _mult(contract)
+                cost_basis = entry_px * multiplier
+                inv_cost = 1.0 / cost_basis if cost_basis > 0 else 0.0
                 # Reset baseline MES price to current for hybrid roll logic
                 base_mes_price = mes_price
                 # Persist baseline MES price after roll
                 save_base_mes_price(base_mes_price)
                 # Reset roll cooldown
                 roll_enable_time = time.time() + CHECK_INTERVAL
-                with summary_lock:
-                    summary_data['price'] = base_mes_price
-                    summary_data['strike'] = contract.strike
-                    summary_data['exp'] = contract.lastTradeDateOrContractMonth
-                    summary_data['just_filled'] = True
-                    skip_summary_count = 2
+                publish_summary(price=base_mes_price, strike=contract.strike,
+                                exp=contract.lastTradeDateOrContractMonth, just_filled=True)
+                skip_summary()
                 # Confirm the restored position has appeared in IBKR (single immediate check)
-                ib.reqPositions()
-                if any(p.contract.localSymbol == contract.localSymbol and p.position < 0 for p in ib.positions()):
-                    print(f"✅ Confirmed position for restored call: {contract.localSymbol}")
+                # Refresh the snapshot after the fill
+                positions_by_symbol = short_calls_by_symbol()
+                if contract.localSymbol in positions_by_symbol:
+                    log.info("✅ Confirmed position for restored call: %s", contract.localSymbol)
                 else:
-                    print(f"⚠️ Could not confirm restored call immediately; will verify next loop")
+                    log.warning("⚠️ Could not confirm restored call immediately; will verify next loop")
             else:
-                print("⚠️ Failed to restore short call; will retry after interval")
-            with summary_lock:
-                summary_paused = False
+                log.warning("⚠️ Failed to restore short call; will retry after interval")
+            _paused_event.clear()
             # Skip roll logic this iteration
             if ib.isConnected():
                 ib.sleep(CHECK_INTERVAL)
             continue
+        # 2) Read the latest quote from the streaming option ticker
+        raw_bid = _v(opt_ticker.bid)
+        raw_ask = _v(opt_ticker.ask)
+        # No usable option quote yet (None/NaN): skip the iteration rather than price PnL off 0.0
+        if raw_bid is None or raw_ask is None:
+            wait_for_quotes(ib, CHECK_INTERVAL)
+            continue
+        # Normalize bids/asks (IB reports -1 / 0 for an empty side, e.g. a near-worthless call)
+        bid = raw_bid if raw_bid > 0 else 0.0
+        ask = raw_ask if raw_ask > bid else bid
+        # 3) Calculate metrics
+        option_mid = (bid + ask) / 2
+        # Refresh the basis from the live position's average cost (total dollars, per contract)
+        # avgCost on a short call is negative total premium received; invert sign for basis
+        avg_cost_total = abs(pos.avgCost)
+        if avg_cost_total != cost_basis:
+            cost_basis = avg_cost_total
+            entry_px = avg_cost_total / multiplier
+            inv_cost = 1.0 / cost_basis if cost_basis > 0 else 0.0
+        # Recalculate PnL using the true basis (inlined calc_pnl_percent)
+        unreal = (entry_px - option_mid) * multiplier
+        pnl_pct = unreal * inv_cost * 100
+        spread = ask - bid
+        # --- Compute move from baseline MES price ---
+        move_down = max(0, base_mes_price - mes_price)
+        move_up   = max(0, mes_price - base_mes_price)
         # ───────────────────────────────────────────────────
         # Always print summary each loop for real‑time updates
         LAST_PRINTED_PNL = pnl_pct
         LAST_PRINTED_SPREAD = spread
-        ts_summary = datetime.now(ZoneInfo('America/New_York')).strftime('%H:%M:%S')
         # Compute summary values but do not print them here; only update shared state.
         # Distance to roll thresholds
         pct_to_profit = max(0, PROFIT_TARGET - pnl_pct)
@@ -787,277 +1326,78 @@ def run_bot():
         remaining_down = max(0, MES_MOVE_DOWN_THRESHOLD - move_down)
         remaining_up   = max(0, MES_MOVE_UP_THRESHOLD   - move_up)
         # quantize distances to 0.25 increments
-        remaining_down = round(remaining_down * 4) / 4
-        remaining_up   = round(remaining_up   * 4) / 4
-
-        # Fetch USD cash balance once per loop using TotalCashBalance tag (live snapshot)
-        ib.reqAccountSummary()  # refresh snapshot
-        account_summary = ib.accountSummary()
-        cash_balance = next((float(row.value) for row in account_summary
-                             if row.tag == 'TotalCashBalance' and row.currency == 'USD'), float('nan'))
-
-        # Update shared summary state for printer thread
-        with summary_lock:
-            summary_data.update(dict(
-                mes_rt_price = mes_price,
-                price        = base_mes_price,
-                strike       = contract.strike,
-                exp          = contract.lastTradeDateOrContractMonth,
-                bid          = bid,
-                ask          = ask,
-                spread       = spread,
-                fut_bid      = fut_bid,
-                fut_ask      = fut_ask,
-                cost         = cost_basis,
-                pnl          = unreal,
-                pnl_pct      = pnl_pct,
-                cash         = cash_balance,
-                pct_to_profit = pct_to_profit,
-                pct_to_loss   = pct_to_loss,
-                down_left    = remaining_down,
-                up_left      = remaining_up,
-            ))
+        remaining_down = _to_quarter(remaining_down)
+        remaining_up   = _to_quarter(remaining_up)
+
+        # USD cash balance (TotalCashBalance), refreshed from IB at most every CASH_CACHE_TTL
+        cash_balance = get_cash_balance(ib)
+
+        # Update shared summary state for printer thread: the loop supplies every field,
+        # so publish one dict literal directly instead of merging a temporary kwargs dict
+        set_summary({
+            'mes_rt_price': mes_price,
+            'price': base_mes_price,
+            'strike': contract.strike,
+            'exp': contract.lastTradeDateOrContractMonth,
+            'bid': bid,
+            'ask': ask,
+            'spread': spread,
+            'fut_bid': fut_bid,
+            'fut_ask': fut_ask,
+            'cost': cost_basis,
+            'pnl': unreal,
+            'pnl_pct': pnl_pct,
+            'cash': cash_balance,
+            'pct_to_profit': pct_to_profit,
+            'pct_to_loss': pct_to_loss,
+            'down_left': remaining_down,
+            'up_left': remaining_up,
+        })
         # 5) Roll condition
         # Use move_down and move_up (relative to baseline MES), not strike
 
+        strike_delta = None
         if pnl_pct >= PROFIT_TARGET and move_down >= MES_MOVE_DOWN_THRESHOLD:
-            print('▶️ Rolling DOWN')
-            with summary_lock:
-                summary_paused = True
-            # 1) Buy to close existing short call
-            print('📤 Buying to close short call')
-            # Show current call spread before BUY-to-close using snapshot NBBO
-            md = ib.reqMktData(contract, '', False, True)
-            ib.sleep(0.1)  # allow snapshot to populate
-            # Treat None or NaN bids/asks as zero
-            raw_bid = md.bid
-            bid_bc = raw_bid if (raw_bid is not None and not math.isnan(raw_bid)) else 0.0
-            raw_ask = md.ask
-            ask_bc = raw_ask if (raw_ask is not None and not math.isnan(raw_ask)) else bid_bc
-            spread_bc = ask_bc - bid_bc
-            print(f"⚖️ Call spread before BUY-to-close: {spread_bc:.2f} (bid {bid_bc:.2f} / ask {ask_bc:.2f})")
-            # ─── Skip buy-to-close if spread is zero / negative ───
-            if spread_bc <= 0:
-                print(f"⚠️ Spread {spread_bc:.2f} ≤ 0; invalid quote, skipping buy-to-close")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
-            # ─── Skip buy-to-close when spread indicates low liquidity ───
-            if spread_bc > 3.0:
-                print(f"⚠️ Spread {spread_bc:.2f} > 3.0; spread too wide, skipping buy-to-close")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
-            # ─── Skip buy-to-close when spread too wide ───
-            if spread_bc > 3.0:
-                print(f"⚠️ Spread {spread_bc:.2f} > 3.0; skipping buy-to-close and roll-down")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
-            # Ensure contract has up-to-date conId and localSymbol
-            ib.qualifyContracts(contract)
-            ib.reqPositions()
-            pos_to_close = None
-            for pos in ib.positions():
-                if pos.contract.localSymbol == contract.localSymbol and pos.position < 0:
-                    pos_to_close = pos
-                    break
-            if not pos_to_close:
-                print(f"⚠️ No short call position found for {contract.localSymbol}, skipping close")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
-            trade_close = place_stepped_limit(ib, contract, 'BUY', abs(pos_to_close.position))
-            if trade_close and hasattr(trade_close, 'fills') and trade_close.fills:
-                fill_px = trade_close.fills[-1].execution.price
-                print(f"✅ Closed short call {contract.localSymbol} at ${fill_px:.2f}")
-                # Record that a close succeeded
-                close_filled = True
-                # 2) Sell to open new short call
-                print('📥 Selling to open new short call')
-                # Show current call spread before SELL-to-open
-                new_contract = choose_option_contract(ib, -STRIKE_STEP)
-                so_ticker = ib.reqTickers(new_contract)[0]
-                ib.sleep(0.1)
-                bid_so = so_ticker.bid or 0.0
-                ask_so = so_ticker.ask or bid_so
-                spread_so = ask_so - bid_so
-                print(f"⚖️ Call spread before SELL-to-open: {spread_so:.2f} (bid {bid_so:.2f} / ask {ask_so:.2f})")
-                ensure_single_short_call(ib)
-                trade = place_stepped_limit(ib, new_contract, 'SELL', 1)
-                # Ensure only one short call after rolling down
-                ensure_single_short_call(ib)
-                # fallback if no fill
-                if not (trade and hasattr(trade, 'fills') and trade.fills):
-                    print("⚠️ Market‑to‑Limit fallback did not fill; will retry next loop")
-                    if ib.isConnected():
-                        ib.sleep(CHECK_INTERVAL)
-                    continue
-                # Confirm sell-to-open fill and update only if filled
-                filled = False
-                if trade and hasattr(trade, 'fills') and trade.fills:
-                    filled = True
-                    fill_px = trade.fills[-1].execution.price
-                elif getattr(trade, 'orderStatus', None) and trade.orderStatus.status == 'Filled':
-                    filled = True
-                    fill_px = getattr(trade.orderStatus, 'avgFillPrice', trade.order.lmtPrice)
-                if filled:
-                    print(f"✅ Opened new short call: {trade.contract.localSymbol} at ${fill_px:.2f}")
-                    # Clear stale summary to prevent printing old data
-                    with summary_lock:
-                        summary_data.clear()
-                # Stamp new baseline MES at roll-down fill
-                mid = fetch_mes_mid(ib)
-                if not math.isnan(mid):
-                    base_mes_price = mid
-                    save_base_mes_price(base_mes_price)
-                    # Increment roll count
-                    today = datetime.now(ZoneInfo('America/New_York')).strftime('%Y-%m-%d')
-                    week = datetime.now(ZoneInfo('America/New_York')).isocalendar()
-                    week_key = f"{week[0]}-W{week[1]:02d}"
-                    roll_counts['daily'][today] = roll_counts['daily'].get(today, 0) + 1
-                    roll_counts['weekly'][week_key] = roll_counts['weekly'].get(week_key, 0) + 1
-                    save_roll_counts(roll_counts)
-                    print(f"📊 Rolls today ({today}): {roll_counts['daily'][today]}, this week ({week_key}): {roll_counts['weekly'][week_key]}")
-                    with summary_lock:
-                        summary_data['price'] = base_mes_price
-                        summary_data['strike'] = trade.contract.strike
-                        summary_data['exp'] = trade.contract.lastTradeDateOrContractMonth
-                        summary_data['just_filled'] = True
-                        skip_summary_count = 2
-                else:
-                    print("⚠️ Failed to fetch valid MES mid at fill; baseline remains unchanged")
-                with summary_lock:
-                    summary_paused = False
-                contract = trade.contract
-                entry_px = fill_px
-                multiplier = int(contract.multiplier)
-                # Confirmation print already above; removed detailed summary block per instructions.
-                # ──────────────────────────────────────────────────────
-            else:
-                print("⚠️ Close did not fill within timeout; no confirmation of fill.")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
+            log.info('▶️ Rolling DOWN')
+            strike_delta, tag = -STRIKE_STEP, 'down'
         elif pnl_pct <= LOSS_LIMIT and move_up >= MES_MOVE_UP_THRESHOLD:
-            print('⚠️ Rolling UP')
-            with summary_lock:
-                summary_paused = True
-            # 1) Buy to close existing short call
-            print('📤 Buying to close short call')
-            # Show current call spread before BUY-to-close
-            bc_ticker = ib.reqTickers(contract)[0]
-            ib.sleep(0.2)
-            bid_bc = bc_ticker.bid or 0.0
-            ask_bc = bc_ticker.ask or bid_bc
-            spread_bc = ask_bc - bid_bc
-            print(f"⚖️ Call spread before BUY-to-close: {spread_bc:.2f} (bid {bid_bc:.2f} / ask {ask_bc:.2f})")
-            # ─── Skip buy-to-close if spread is zero / negative ───
-            if spread_bc <= 0:
-                print(f"⚠️ Spread {spread_bc:.2f} ≤ 0; invalid quote, skipping buy-to-close")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
-            # ─── Skip buy-to-close when spread indicates low liquidity ───
-            if spread_bc > 3.0:
-                print(f"⚠️ Spread {spread_bc:.2f} > 3.0; spread too wide, skipping buy-to-close")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
-            # ─── Skip buy-to-close when spread too wide ───
-            if spread_bc > 3.0:
-                print(f"⚠️ Spread {spread_bc:.2f} > 3.0; skipping buy-to-close and roll-up")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
-            # Ensure contract has up-to-date conId and localSymbol
-            ib.qualifyContracts(contract)
-            ib.reqPositions()
-            pos_to_close = None
-            for pos in ib.positions():
-                if pos.contract.localSymbol == contract.localSymbol and pos.position < 0:
-                    pos_to_close = pos
-                    break
-            if not pos_to_close:
-                print(f"⚠️ No short call position found for {contract.localSymbol}, skipping close")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
-                continue
-            trade_close = place_stepped_limit(ib, contract, 'BUY', abs(pos_to_close.position))
-            if trade_close and hasattr(trade_close, 'fills') and trade_close.fills:
-                fill_px = trade_close.fills[-1].execution.price
-                print(f"✅ Closed short call {contract.localSymbol} at ${fill_px:.2f}")
-                # Record that a close succeeded
-                close_filled = True
-                # 2) Sell to open new short call
-                print('📥 Selling to open new short call')
-                # Show current call spread before SELL-to-open
-                new_contract = choose_option_contract(ib, STRIKE_STEP)
-                so_ticker = ib.reqTickers(new_contract)[0]
-                ib.sleep(0.1)
-                bid_so = so_ticker.bid or 0.0
-                ask_so = so_ticker.ask or bid_so
-                spread_so = ask_so - bid_so
-                print(f"⚖️ Call spread before SELL-to-open: {spread_so:.2f} (bid {bid_so:.2f} / ask {ask_so:.2f})")
-                ensure_single_short_call(ib)
-                trade = place_stepped_limit(ib, new_contract, 'SELL', 1)
-                ensure_single_short_call(ib)
-                # Always update to new short call after buy-to-close
-                # Determine fill price, guarding against None trade
-                if not (trade and hasattr(trade, 'fills') and trade.fills):
-                    print("⚠️ Market‑to‑Limit fallback did not fill; will retry next loop")
-                    if ib.isConnected():
-                        ib.sleep(CHECK_INTERVAL)
-                    continue
-                if trade and hasattr(trade, 'fills') and trade.fills:
-                    fill_px = trade.fills[-1].execution.price
-                elif trade and getattr(trade, 'order', None) is not None:
-                    fill_px = getattr(trade.order, 'lmtPrice', entry_px)
-                print(f"✅ Opened new short call: {trade.contract.localSymbol} at ${fill_px:.2f}")
-                # Clear stale summary to prevent printing old data
-                with summary_lock:
-                    summary_data.clear()
-                # Stamp new baseline MES at roll-up fill
-                mid = fetch_mes_mid(ib)
-                if not math.isnan(mid):
-                    base_mes_price = mid
-                    save_base_mes_price(base_mes_price)
-                    # Increment roll count
-                    today = datetime.now(ZoneInfo('America/New_York')).strftime('%Y-%m-%d')
-                    week = datetime.now(ZoneInfo('America/New_York')).isocalendar()
-                    week_key = f"{week[0]}-W{week[1]:02d}"
-                    roll_counts['daily'][today] = roll_counts['daily'].get(today, 0) + 1
-                    roll_counts['weekly'][week_key] = roll_counts['weekly'].get(week_key, 0) + 1
-                    save_roll_counts(roll_counts)
-                    print(f"📊 Rolls today ({today}): {roll_counts['daily'][today]}, this week ({week_key}): {roll_counts['weekly'][week_key]}")
-                    with summary_lock:
-                        summary_data['price'] = base_mes_price
-                        summary_data['strike'] = trade.contract.strike
-                        summary_data['exp'] = trade.contract.lastTradeDateOrContractMonth
-                        summary_data['just_filled'] = True
-                        skip_summary_count = 2
-                else:
-                    print("⚠️ Failed to fetch valid MES mid at fill; baseline remains unchanged")
-                with summary_lock:
-                    summary_paused = False
-                contract = trade.contract
-                entry_px = fill_px
-                multiplier = int(contract.multiplier)
-                # Confirmation print already above; removed detailed summary block per instructions.
-                # ──────────────────────────────────────────────────────
-            else:
-                print("⚠️ Close did not fill within timeout; no confirmation of fill.")
-                if ib.isConnected():
-                    ib.sleep(CHECK_INTERVAL)
+            log.warning('⚠️ Rolling UP')
+            strike_delta, tag = STRIKE_STEP, 'up'
+        if strike_delta is not None:
+            # Keep the roll's last order in scope so the in-flight guard pauses while it works
+            trade, rolled = _execute_roll(ib, contract, positions_by_symbol, strike_delta, base_mes_price, tag)
+            if rolled is None:
                 continue
+            new_contract, entry_px, multiplier, base_mes_price = rolled
+            # Move the streaming subscription to the new strike
+            unsubscribe_ticker(ib, contract)
+            contract = new_contract
+            opt_ticker = subscribe_ticker(ib, contract)
+            cost_basis = entry_px * multiplier
+            inv_cost = 1.0 / cost_basis if cost_basis > 0 else 0.0
         if ib.isConnected():
-            ib.sleep(CHECK_INTERVAL)
+            # Wake on the next tick of our option/future streams instead of any IB update
+            wait_for_quotes(ib, CHECK_INTERVAL)
 
 
 if __name__ == '__main__':
+    delay, failures = CHECK_INTERVAL, 0
     while True:
+        started = time.monotonic()
         try:
-            run_bot()
+            run_bot()  # only returns by raising; _run_bot loops forever
         except Exception as e:
-            print(f"❌ Bot error: {e}; restarting in {CHECK_INTERVAL}s")
-        time.sleep(CHECK_INTERVAL)
+            # A crash after a long healthy run starts a fresh streak instead of escalating
+            if time.monotonic() - started >= HEALTHY_RUN_SECONDS:
+                delay, failures = CHECK_INTERVAL, 0
+            failures += 1
+            if failures >= MAX_CONSECUTIVE_FAILS:
+                log.exception("🛑 Bot error: %s; %s consecutive failures, exiting for a clean restart", e, failures)
+                sys.exit(1)  # atexit still flushes persisted state and the log queue
+            # Jitter keeps restarts from hammering TWS in lockstep during an outage
+            wait = delay + random.uniform(0, delay * 0.2)
+            log.exception("❌ Bot error: %s; restarting in %.1fs (failure %s/%s)", e, wait, failures, MAX_CONSECUTIVE_FAILS)
+            # Contract lookups may be what failed; re-query them on restart
+            invalidate_contract_cache()
+            time.sleep(wait)
+            delay = min(delay * 2, MAX_RESTART_DELAY)